@@ -1,8 +1,111 @@
 """Configuration loader for Directory OCR."""
 
+import copy
+import hashlib
+import io
+import os
+import pickle
+import re
 import yaml
+from collections import OrderedDict
+from functools import cached_property
 from pathlib import Path
-from typing import Dict, Any
+from typing import Callable, Dict, Any, FrozenSet, Optional, Tuple
+
+try:
+    from yaml import CSafeLoader as _Loader
+except ImportError:  # PyYAML built without LibYAML
+    from yaml import SafeLoader as _Loader
+
+# Placeholders filled into the extraction prompt
+_PROMPT_FIELD_RE = re.compile(r'\{(text|match_data)\}')
+
+# Parsed configuration per resolved path as (mtime_ns, size, data), least recently used first
+_CONFIG_CACHE: OrderedDict[str, Tuple[int, int, Dict[str, Any]]] = OrderedDict()
+_CONFIG_CACHE_MAX_ENTRIES = 100
+
+# Shortest allowed processing.sleep_time in seconds
+_MIN_SLEEP_TIME = 0.1
+
+# Globals a config snapshot may reference; safe_load only produces these besides builtins
+_SNAPSHOT_GLOBALS = frozenset({
+    ('datetime', 'date'),
+    ('datetime', 'datetime'),
+    ('datetime', 'timedelta'),
+    ('datetime', 'timezone'),
+})
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    """Unpickler that refuses anything a YAML safe load could not have produced."""
+    
+    def find_class(self, module: str, name: str) -> Any:
+        if (module, name) not in _SNAPSHOT_GLOBALS:
+            raise pickle.UnpicklingError(f"Unexpected global in config snapshot: {module}.{name}")
+        return super().find_class(module, name)
+
+
+def _snapshot_path(config_file: str) -> str:
+    """Get the path of the parsed-config snapshot stored next to a config file."""
+    directory, name = os.path.split(config_file)
+    return os.path.join(directory, f".{name}.cache")
+
+
+def _snapshot_header(st: os.stat_result, payload: bytes) -> bytes:
+    """Build the snapshot header tying a pickle to one version of the config file."""
+    digest = hashlib.blake2b(payload, digest_size=16).hexdigest()
+    return f"{st.st_mtime_ns}:{st.st_size}:{digest}\n".encode('ascii')
+
+
+def _read_snapshot(config_file: str, st: os.stat_result) -> Optional[Dict[str, Any]]:
+    """
+    Load the parsed configuration from its snapshot if it matches the config file.
+    
+    Args:
+        config_file: Absolute path to the YAML file
+        st: Current stat of the YAML file
+        
+    Returns:
+        Parsed configuration, or None if there is no valid, up-to-date snapshot
+    """
+    try:
+        with open(_snapshot_path(config_file), 'rb') as f:
+            header = f.readline()
+            payload = f.read()
+        # The digest rejects a damaged payload before it reaches the unpickler
+        if header != _snapshot_header(st, payload):
+            return None
+        return _SnapshotUnpickler(io.BytesIO(payload)).load()
+    except Exception:
+        # Any problem with the snapshot just means there is no usable snapshot
+        return None
+
+
+def _write_snapshot(config_file: str, st: os.stat_result, data: Dict[str, Any]) -> None:
+    """
+    Store the parsed configuration next to the config file for the next start.
+    
+    The snapshot is replaced atomically. Failures (e.g. a read-only folder) are
+    ignored, as the snapshot is only a speedup.
+    
+    Args:
+        config_file: Absolute path to the YAML file
+        st: Stat of the YAML file the data was parsed from
+        data: Parsed configuration
+    """
+    snapshot = _snapshot_path(config_file)
+    tmp = f"{snapshot}.{os.getpid()}.tmp"
+    try:
+        payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(tmp, 'wb') as f:
+            f.write(_snapshot_header(st, payload))
+            f.write(payload)
+        os.replace(tmp, snapshot)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
 
 
 class Config:
@@ -17,47 +120,136 @@ class Config:
         """
         self.config_path = Path(config_path)
         self.config = self._load_config()
+        self._folder_cache: Dict[str, Path] = {}
         
     def _load_config(self) -> Dict[str, Any]:
-        """Load configuration from YAML file."""
-        with open(self.config_path, 'r') as f:
-            return yaml.safe_load(f)
+        """
+        Load configuration from YAML file.
+        
+        The parsed data is cached per file and reused while its modification
+        time and size are unchanged. Each Config gets its own deep copy, so
+        changes made through one instance never leak into another. A pickled
+        snapshot next to the file lets later runs skip the YAML parse.
+        """
+        key = str(self.config_path.resolve())
+        st = os.stat(key)
+        cached = _CONFIG_CACHE.get(key)
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            _CONFIG_CACHE.move_to_end(key)
+            return copy.deepcopy(cached[2])
+        
+        data = _read_snapshot(key, st)
+        if data is None:
+            with open(key, 'rb') as f:
+                data = yaml.load(f.read(), Loader=_Loader)
+            _write_snapshot(key, st, data)
+        
+        _CONFIG_CACHE[key] = (st.st_mtime_ns, st.st_size, data)
+        _CONFIG_CACHE.move_to_end(key)
+        while len(_CONFIG_CACHE) > _CONFIG_CACHE_MAX_ENTRIES:
+            _CONFIG_CACHE.popitem(last=False)
+        return copy.deepcopy(data)
     
-    @property
+    @cached_property
     def folders(self) -> Dict[str, str]:
         """Get folder paths configuration."""
         return self.config.get('folders', {})
     
-    @property
+    @cached_property
     def llm(self) -> Dict[str, Any]:
         """Get LLM configuration."""
         return self.config.get('llm', {})
     
-    @property
+    @cached_property
     def processing(self) -> Dict[str, Any]:
         """Get processing settings."""
         return self.config.get('processing', {})
     
-    @property
+    @cached_property
     def extraction_prompt(self) -> str:
         """Get the extraction prompt template."""
         return self.config.get('extraction_prompt', '')
     
-    @property
+    @cached_property
+    def extraction_prompt_fn(self) -> Callable[[str, str], str]:
+        """
+        Get a renderer for the extraction prompt.
+        
+        The template is split on its {text} and {match_data} placeholders once,
+        so rendering is a plain join. Templates using any other format syntax
+        (escaped braces, other fields) are rendered with str.format instead.
+        
+        Returns:
+            Function taking (text, match_data) and returning the prompt
+        """
+        template = self.extraction_prompt
+        parts = _PROMPT_FIELD_RE.split(template)
+        literals = parts[0::2]
+        fields = parts[1::2]
+        
+        if any('{' in literal or '}' in literal for literal in literals):
+            return lambda text, match_data: template.format(text=text, match_data=match_data)
+        
+        def render(text: str, match_data: str) -> str:
+            values = {'text': text, 'match_data': match_data}
+            pieces = [literals[0]]
+            for field, literal in zip(fields, literals[1:]):
+                pieces.append(values[field])
+                pieces.append(literal)
+            return "".join(pieces)
+        
+        return render
+    
+    @cached_property
     def ocr_prompt(self) -> str:
         """Get the OCR prompt."""
         return self.config.get('ocr_prompt', '')
     
-    @property
+    @cached_property
+    def image_extensions(self) -> FrozenSet[str]:
+        """Get the lowercased image file extensions (OCR via the vision model)."""
+        return frozenset(ext.lower() for ext in self.processing.get('image_extensions', []))
+    
+    @cached_property
+    def pdf_extensions(self) -> FrozenSet[str]:
+        """Get the lowercased PDF file extensions."""
+        return frozenset(ext.lower() for ext in self.processing.get('pdf_extensions', []))
+    
+    @cached_property
+    def supported_extensions(self) -> FrozenSet[str]:
+        """Get all lowercased file extensions processed in step 1."""
+        return self.image_extensions | self.pdf_extensions
+    
+    @cached_property
     def match_file_path(self) -> Path:
         """Get the path to the match CSV file."""
         match_file = self.processing.get('match_file', 'data/matchwith.csv')
-        return Path(match_file).resolve()
+        return Path(os.path.abspath(match_file))
+    
+    @cached_property
+    def sleep_time(self) -> float:
+        """Get the interval in seconds between periodic housekeeping runs."""
+        # 0 used to mean "no pause"; an interval is needed now, as 0 would make
+        # the poll thread spin and turn off the watcher's idle timeout
+        return max(_MIN_SLEEP_TIME, self.processing.get('sleep_time', 2))
+    
+    @cached_property
+    def pretty_json(self) -> bool:
+        """Get whether JSON output files are indented for readability."""
+        return bool(self.processing.get('pretty_json', False))
+    
+    @cached_property
+    def workers(self) -> int:
+        """Get the number of files processed concurrently in step 1 and watch mode."""
+        return max(1, int(self.processing.get('workers', 4)))
     
-    @property
-    def sleep_time(self) -> int:
-        """Get the sleep time in seconds between processing loops."""
-        return self.processing.get('sleep_time', 2)
+    @cached_property
+    def paths(self) -> Dict[str, Path]:
+        """Get absolute paths of the pipeline folders, keyed by folder name."""
+        return {
+            name: self.get_folder_path(name)
+            for name in ('incoming', 'extracted', 'processed', 'matches', 'errors', 'output', 'cache')
+        }
     
     def get_folder_path(self, folder_name: str) -> Path:
         """
@@ -69,5 +261,8 @@ class Config:
         Returns:
             Absolute path to the folder
         """
-        folder_path = self.folders.get(folder_name, folder_name)
-        return Path(folder_path).resolve()
+        path = self._folder_cache.get(folder_name)
+        if path is None:
+            folder_path = self.folders.get(folder_name, folder_name)
+            path = self._folder_cache[folder_name] = Path(os.path.abspath(folder_path))
+        return path
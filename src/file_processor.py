@@ -1,17 +1,90 @@
 """File processor orchestrating the two-step processing pipeline."""
 
 import csv
-import json
+import errno
 import logging
+import os
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
 from pathlib import Path
-from typing import Optional, List, Tuple
+from typing import Optional, Dict, List, Tuple
+from . import json_utils
 from .text_extractor import TextExtractor
 from .llm_client import LLMClient
 from .config import Config
 
 logger = logging.getLogger(__name__)
 
+# A new file counts as completely written once its size and modification time
+# have not changed for this many seconds
+_WRITE_QUIET_SECONDS = 0.5
+
+# Files last modified longer ago than this are accepted after a single stat
+# (comfortably above the mtime resolution of FAT and network file systems)
+_SETTLED_SECONDS = 2.0
+
+# Writers often create a file before writing to it, so empty files are only
+# processed (and moved to errors) once they have been left alone this long
+_EMPTY_FILE_GRACE_SECONDS = 30.0
+
+
+def _wait_until_written(path: Path, max_wait: float = 2.0, interval: float = 0.05) -> bool:
+    """
+    Wait until a file is no longer being written.
+    
+    Args:
+        path: File to check
+        max_wait: Give up after this many seconds
+        interval: Seconds between two samples of size and modification time
+        
+    Returns:
+        True if the file has stopped changing, False if it was still changing
+        (or is a recently created empty file) when max_wait ran out
+        
+    Raises:
+        FileNotFoundError: If the file disappears while waiting
+    """
+    st = os.stat(path)
+    idle = time.time() - st.st_mtime
+    if idle >= (_SETTLED_SECONDS if st.st_size > 0 else _EMPTY_FILE_GRACE_SECONDS):
+        return True
+    
+    deadline = time.monotonic() + max_wait
+    state = (st.st_size, st.st_mtime_ns)
+    stable_since = time.monotonic()
+    while True:
+        now = time.monotonic()
+        if state[0] > 0 and now - stable_since >= _WRITE_QUIET_SECONDS:
+            return True
+        if now >= deadline:
+            return False
+        time.sleep(interval)
+        st = os.stat(path)
+        current = (st.st_size, st.st_mtime_ns)
+        if current != state:
+            state = current
+            stable_since = time.monotonic()
+
+
+def _move_file(src: Path, dst: Path) -> None:
+    """
+    Move a file, using a plain rename when both paths are on the same filesystem.
+    
+    Falls back to shutil.move (copy + delete) for cross-device moves.
+    
+    Args:
+        src: File to move
+        dst: Destination file path
+    """
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(str(src), str(dst))
+
 
 class FileProcessor:
     """Orchestrator for the two-step file processing pipeline."""
@@ -25,106 +98,235 @@ class FileProcessor:
         """
         self.config = config
         
-        # Initialize LLM clients
-        vision_endpoint = config.llm.get('vision_endpoint', 'http://localhost:8080')
-        text_endpoint = config.llm.get('text_endpoint', 'http://localhost:8081')
-        timeout = config.llm.get('timeout', 120)
-        
-        self.vision_client = LLMClient(vision_endpoint, timeout)
-        self.text_client = LLMClient(text_endpoint, timeout)
-        
-        # Initialize text extractor
-        self.text_extractor = TextExtractor(
-            vision_client=self.vision_client,
-            ocr_prompt=config.ocr_prompt
-        )
+        # LLM clients and the text extractor are created on first use, so a
+        # run that only matches (or only extracts) never sets up the other one
         
         # Get folder paths
-        self.incoming_dir = config.get_folder_path('incoming')
-        self.extracted_dir = config.get_folder_path('extracted')
-        self.processed_dir = config.get_folder_path('processed')
-        self.matches_dir = config.get_folder_path('matches')
-        self.errors_dir = config.get_folder_path('errors')
-        self.output_dir = config.get_folder_path('output')
+        paths = config.paths
+        self.incoming_dir = paths['incoming']
+        self.extracted_dir = paths['extracted']
+        self.processed_dir = paths['processed']
+        self.matches_dir = paths['matches']
+        self.errors_dir = paths['errors']
+        self.output_dir = paths['output']
         
         # Ensure directories exist
-        self.incoming_dir.mkdir(parents=True, exist_ok=True)
-        self.extracted_dir.mkdir(parents=True, exist_ok=True)
-        self.processed_dir.mkdir(parents=True, exist_ok=True)
-        self.matches_dir.mkdir(parents=True, exist_ok=True)
-        self.errors_dir.mkdir(parents=True, exist_ok=True)
-        self.output_dir.mkdir(parents=True, exist_ok=True)
+        for directory in (
+            self.incoming_dir,
+            self.extracted_dir,
+            self.processed_dir,
+            self.matches_dir,
+            self.errors_dir,
+            self.output_dir,
+        ):
+            if not os.path.isdir(directory):
+                directory.mkdir(parents=True, exist_ok=True)
         
         # Get supported extensions
-        processing = config.processing
-        self.supported_extensions = set(
-            processing.get('image_extensions', []) + 
-            processing.get('pdf_extensions', [])
+        self.supported_extensions = config.supported_extensions
+        
+        # Parsed match CSV as (mtime_ns, size, rows), reused until the file changes
+        self._csv_cache: Optional[Tuple[int, int, List[List[str]]]] = None
+        # Normalized CSV rows grouped by date: date -> [(lowercased description, row), ...]
+        self._csv_index: Dict[str, List[Tuple[str, List[str]]]] = {}
+        # (extracted dir mtime_ns, CSV mtime_ns, CSV size) seen by the last process_step2
+        self._step2_state: Optional[Tuple[int, int, int]] = None
+    
+    @cached_property
+    def vision_client(self) -> LLMClient:
+        """LLM client for the vision (OCR) model."""
+        llm = self.config.llm
+        return LLMClient(
+            llm.get('vision_endpoint', 'http://localhost:8080'),
+            llm.get('timeout', 120),
+            pool_size=self.config.workers
+        )
+    
+    @cached_property
+    def text_client(self) -> LLMClient:
+        """LLM client for the text (matching) model."""
+        llm = self.config.llm
+        return LLMClient(
+            llm.get('text_endpoint', 'http://localhost:8081'),
+            llm.get('timeout', 120)
+        )
+    
+    @cached_property
+    def text_extractor(self) -> TextExtractor:
+        """Text extractor for PDFs and images."""
+        return TextExtractor(
+            vision_client=self.vision_client,
+            ocr_prompt=self.config.ocr_prompt,
+            cache_dir=self.config.paths['cache'],
+            image_extensions=self.config.image_extensions,
+            pdf_extensions=self.config.pdf_extensions
         )
     
+    def close(self) -> None:
+        """Release the text extractor's worker processes and cache, if it was created."""
+        extractor = self.__dict__.pop('text_extractor', None)
+        if extractor is not None:
+            extractor.close()
+    
     def process_step1(self) -> int:
         """
         Step 1: Process all files in incoming folder.
         
         Extract text from images/PDFs and save to extracted folder.
-        Move source files to processed or errors.
+        Move source files to processed or errors. Up to ``processing.workers``
+        files are processed concurrently, since each one mostly waits on the
+        vision LLM. Files still being written are left in incoming for a
+        later run.
         
         Returns:
             Number of files successfully processed
         """
-        files = [f for f in self.incoming_dir.iterdir() 
-                if f.is_file() and f.suffix.lower() in self.supported_extensions]
-        
+        files = self.list_incoming()
         if not files:
             return 0
         
         logger.info(f"Step 1: Processing {len(files)} file(s) from incoming")
-        
-        processed_count = 0
-        for file_path in files:
-            try:
-                logger.info(f"Processing: {file_path.name}")
-                
-                # Extract text
-                text = self.text_extractor.extract_text(file_path)
-                if not text:
-                    logger.error(f"Text extraction failed for {file_path.name}")
-                    self._move_to_errors(file_path)
-                    continue
-                
-                # Save text to extracted folder
-                txt_path = self.extracted_dir / f"{file_path.stem}.txt"
-                txt_path.write_text(text, encoding='utf-8')
-                logger.info(f"Saved extracted text: {txt_path.name}")
-                
-                # Move source to processed
-                self._move_to_processed(file_path)
-                processed_count += 1
-                
-            except Exception as e:
-                logger.error(f"Processing failed for {file_path.name}: {e}", exc_info=True)
-                self._move_to_errors(file_path)
-        
+        processed_count = self.process_files(files)
         logger.info(f"Step 1 complete: {processed_count}/{len(files)} files processed successfully")
         return processed_count
     
+    def list_incoming(self) -> List[Path]:
+        """
+        List the files with a supported extension in the incoming folder.
+        
+        Returns:
+            Paths to the image and PDF files waiting in incoming
+        """
+        with os.scandir(self.incoming_dir) as entries:
+            return [
+                Path(entry.path) for entry in entries
+                if entry.is_file()
+                and os.path.splitext(entry.name)[1].lower() in self.supported_extensions
+            ]
+    
+    def process_files(self, files: List[Path]) -> int:
+        """
+        Extract text from a batch of files concurrently.
+        
+        Up to ``processing.workers`` files are in flight at once, so their
+        vision LLM requests overlap over the vision client's pooled
+        connections instead of running one round-trip after another. Each
+        file is only processed once it has been completely written.
+        
+        Args:
+            files: Paths to image or PDF files
+            
+        Returns:
+            Number of files successfully processed
+        """
+        if not files:
+            return 0
+        if len(files) == 1:
+            return int(self._process_when_written(files[0]))
+        
+        # Create the extractor before fanning out so workers share one instance
+        self.text_extractor
+        
+        workers = min(self.config.workers, len(files))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return sum(executor.map(self._process_when_written, files))
+    
+    def wait_until_written(self, file_path: Path) -> bool:
+        """
+        Wait (up to two seconds) until a file in incoming is completely written.
+        
+        Args:
+            file_path: Path to the image or PDF file
+            
+        Returns:
+            True if the file is ready to be processed, False if it is still
+            being written or has disappeared
+        """
+        try:
+            if _wait_until_written(file_path):
+                return True
+        except FileNotFoundError:
+            logger.warning(f"File disappeared before processing: {file_path.name}")
+            return False
+        logger.info(f"Still being written, leaving for a later run: {file_path.name}")
+        return False
+    
+    def _process_when_written(self, file_path: Path) -> bool:
+        """Process a file once it is completely written; False if it is not ready."""
+        return self.wait_until_written(file_path) and self.process_file(file_path)
+    
+    def process_file(self, file_path: Path) -> bool:
+        """
+        Extract text from a single file and move it out of incoming.
+        
+        The text is saved to the extracted folder and the source file is moved
+        to processed on success or to errors on failure.
+        
+        Args:
+            file_path: Path to the image or PDF file
+            
+        Returns:
+            True if the file was processed successfully
+        """
+        try:
+            logger.info(f"Processing: {file_path.name}")
+            
+            # Extract text
+            text = self.text_extractor.extract_text(file_path)
+            if not text:
+                logger.error(f"Text extraction failed for {file_path.name}")
+                self._move_to_errors(file_path)
+                return False
+            
+            # Save text to extracted folder
+            txt_path = self.extracted_dir / f"{file_path.stem}.txt"
+            txt_path.write_bytes(text.encode('utf-8'))
+            logger.info(f"Saved extracted text: {txt_path.name}")
+            
+            # Move source to processed
+            self._move_to_processed(file_path)
+            return True
+            
+        except Exception as e:
+            logger.error(f"Processing failed for {file_path.name}: {e}", exc_info=True)
+            self._move_to_errors(file_path)
+            return False
+    
     def process_step2(self) -> None:
         """
         Step 2: Match files in extracted folder with matchwith.csv.
         
         If match found: move text file and matched CSV row to matches folder.
         If no match: keep text file in extracted folder.
+        
+        Returns immediately if neither the extracted folder nor the match file
+        has changed since the previous run, so idle calls cost two stats. A run
+        in which any file failed is not remembered, so those files are retried
+        on the next call.
         """
         # Check if match file exists
         match_file = self.config.match_file_path
-        if not match_file.exists():
+        try:
+            csv_stat = match_file.stat()
+        except FileNotFoundError:
             logger.debug(f"No match file found: {match_file}")
             return
         
+        # Skip the run if nothing changed since the last one
+        state = (os.stat(self.extracted_dir).st_mtime_ns, csv_stat.st_mtime_ns, csv_stat.st_size)
+        if state == self._step2_state:
+            logger.debug("Extracted folder and match file unchanged since last match run")
+            return
+        
         # Get all text files in extracted folder
-        txt_files = list(self.extracted_dir.glob("*.txt"))
+        with os.scandir(self.extracted_dir) as entries:
+            txt_files = [
+                Path(entry.path) for entry in entries
+                if entry.name.endswith('.txt') and entry.is_file()
+            ]
         if not txt_files:
             logger.debug("No files in extracted folder to match")
+            self._step2_state = state
             return
         
         logger.info(f"Step 2: Matching {len(txt_files)} file(s) with {match_file.name}")
@@ -135,45 +337,62 @@ class FileProcessor:
             logger.error("Failed to load CSV data")
             return
         
+        # Prepare CSV data as string for LLM (shared by all files in this run)
+        csv_str = "\n".join(",".join(row) for row in csv_rows)
+        
         # Process each extracted text file
+        failed = 0
         for txt_file in txt_files:
             try:
-                self._match_and_move(txt_file, csv_rows, match_file)
+                if not self._match_and_move(txt_file, csv_str, match_file):
+                    failed += 1
             except Exception as e:
                 logger.error(f"Matching failed for {txt_file.name}: {e}", exc_info=True)
+                failed += 1
+        
+        # Only remember a clean run so failed files are retried next time
+        if failed:
+            logger.warning(f"Step 2: {failed} file(s) failed, will retry on the next run")
+        else:
+            self._step2_state = state
         
         logger.info("Step 2 complete")
     
-    def _match_and_move(self, txt_file: Path, csv_rows: List[List[str]], csv_file: Path) -> None:
+    def _match_and_move(
+        self,
+        txt_file: Path,
+        csv_str: str,
+        csv_file: Path
+    ) -> bool:
         """
         Match a text file with CSV data and move if match found.
         
         Args:
             txt_file: Path to text file to match
-            csv_rows: List of CSV rows
+            csv_str: CSV rows rendered as text for the LLM prompt
             csv_file: Path to CSV file
+            
+        Returns:
+            True if the file was handled (matched or no match), False if the
+            LLM call or moving the match failed
         """
         # Read text content
         text = txt_file.read_text(encoding='utf-8')
         
-        # Prepare CSV data as string for LLM
-        csv_str = "\n".join([",".join(row) for row in csv_rows])
-        
         # Build prompt
-        prompt_template = self.config.extraction_prompt
-        prompt = prompt_template.format(text=text, match_data=csv_str)
+        prompt = self.config.extraction_prompt_fn(text, csv_str)
         
         # Call LLM to find match
         response = self.text_client.generate_text(prompt, temperature=0.0)
         if not response:
             logger.warning(f"No LLM response for {txt_file.name}")
-            return
+            return False
         
         # Parse JSON response
         match_result = self._parse_json_response(response)
         if not match_result:
             logger.warning(f"Failed to parse match result for {txt_file.name}")
-            return
+            return False
         
         # Check confidence threshold
         confidence = match_result.get('confidence', 0.0)
@@ -183,29 +402,32 @@ class FileProcessor:
         
         if confidence >= 0.6 and row_number is not None:
             # Match found - move text file and CSV row to matches
-            self._move_match(txt_file, match_result, csv_rows)
-        else:
-            # No match - keep file in extracted
-            logger.info(f"No match found for {txt_file.name} (confidence={confidence:.2f})")
+            return self._move_match(txt_file, match_result)
+        
+        # No match - keep file in extracted
+        logger.info(f"No match found for {txt_file.name} (confidence={confidence:.2f})")
+        return True
     
-    def _move_match(self, txt_file: Path, match_result: dict, csv_rows: List[List[str]]) -> None:
+    def _move_match(self, txt_file: Path, match_result: dict) -> bool:
         """
         Move matched text file and CSV row to matches folder.
         
         Args:
             txt_file: Text file to move
             match_result: Match result dictionary with date and description fields
-            csv_rows: All CSV rows (including header)
+            
+        Returns:
+            True if the match was moved and saved, False on failure
         """
         try:
             # Move text file
             dest_txt = self.matches_dir / txt_file.name
-            shutil.move(str(txt_file), str(dest_txt))
+            _move_file(txt_file, dest_txt)
             logger.info(f"Moved {txt_file.name} to matches")
             
             # Save match result as JSON
             json_path = self.matches_dir / f"{txt_file.stem}_match.json"
-            json_path.write_text(json.dumps(match_result, indent=2, ensure_ascii=False), encoding='utf-8')
+            json_path.write_bytes(json_utils.dumps(match_result, pretty=self.config.pretty_json))
             logger.info(f"Saved match result: {json_path.name}")
             
             # Find matched CSV row by comparing date and description
@@ -213,36 +435,33 @@ class FileProcessor:
             matched_desc = match_result.get('description', '').strip().strip('"').lower()
             
             matched_row = None
-            for row in csv_rows:
-                if len(row) >= 3:
-                    # CSV structure: date, date, description, amount, total
-                    row_date = row[0].strip().strip('"')
-                    row_desc = row[1].strip().strip('"').lower() if len(row) > 1 else ''
-                    
-                    # Match on date (column 0) and description (column 2)
-                    if len(row) > 2:
-                        row_desc = row[2].strip().strip('"').lower()
-                        
-                        if row_date == matched_date and matched_desc in row_desc:
-                            matched_row = row
-                            logger.info(f"Found matching CSV row: date={row_date}, desc={row[2][:50]}...")
-                            break
+            for row_desc, row in self._csv_index.get(matched_date, ()):
+                if matched_desc in row_desc:
+                    matched_row = row
+                    logger.info(f"Found matching CSV row: date={matched_date}, desc={row[2][:50]}...")
+                    break
             
             # Save matched CSV row
             if matched_row:
                 csv_path = self.matches_dir / f"{txt_file.stem}_matched_row.txt"
-                csv_path.write_text(";".join(matched_row), encoding='utf-8')
+                csv_path.write_bytes(";".join(matched_row).encode('utf-8'))
                 logger.info(f"Saved matched row: {csv_path.name}")
             else:
                 logger.warning(f"Could not find matching CSV row for date={matched_date}, desc={matched_desc[:50]}...")
             
+            return True
+            
         except Exception as e:
             logger.error(f"Failed to move match for {txt_file.name}: {e}")
+            return False
     
     def _load_csv(self, csv_file: Path) -> Optional[List[List[str]]]:
         """
         Load CSV file.
         
+        The parsed rows are cached and reused as long as the file's
+        modification time and size are unchanged.
+        
         Args:
             csv_file: Path to CSV file
             
@@ -250,15 +469,44 @@ class FileProcessor:
             List of rows (each row is a list of strings) or None if failed
         """
         try:
+            st = csv_file.stat()
+            cached = self._csv_cache
+            if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                return cached[2]
+            
             with open(csv_file, 'r', encoding='utf-8') as f:
                 reader = csv.reader(f, delimiter=';')
                 rows = list(reader)
+            self._csv_cache = (st.st_mtime_ns, st.st_size, rows)
+            self._csv_index = self._build_csv_index(rows)
             logger.debug(f"Loaded {len(rows)} rows from {csv_file.name}")
             return rows
         except Exception as e:
             logger.error(f"Failed to load CSV: {e}")
             return None
     
+    @staticmethod
+    def _build_csv_index(rows: List[List[str]]) -> Dict[str, List[Tuple[str, List[str]]]]:
+        """
+        Group CSV rows by normalized date for matching.
+        
+        CSV structure: date, date, description, amount, total. Rows are keyed
+        on the date (column 0) with the lowercased description (column 2).
+        
+        Args:
+            rows: Parsed CSV rows
+            
+        Returns:
+            Mapping of date to (lowercased description, row) pairs in file order
+        """
+        index: Dict[str, List[Tuple[str, List[str]]]] = {}
+        for row in rows:
+            if len(row) >= 3:
+                row_date = row[0].strip().strip('"')
+                row_desc = row[2].strip().strip('"').lower()
+                index.setdefault(row_date, []).append((row_desc, row))
+        return index
+    
     def _parse_json_response(self, response: str) -> Optional[dict]:
         """
         Parse JSON from LLM response.
@@ -271,17 +519,10 @@ class FileProcessor:
         """
         try:
             # Clean up response
-            response = response.strip()
-            if response.startswith("```json"):
-                response = response[7:]
-            if response.startswith("```"):
-                response = response[3:]
-            if response.endswith("```"):
-                response = response[:-3]
-            response = response.strip()
+            response = json_utils.strip_code_fence(response)
             
-            return json.loads(response)
-        except json.JSONDecodeError as e:
+            return json_utils.loads(response)
+        except json_utils.JSONDecodeError as e:
             logger.error(f"Failed to parse JSON: {e}")
             logger.debug(f"Response was: {response[:200]}")
             return None
@@ -295,7 +536,7 @@ class FileProcessor:
         """
         try:
             destination = self.processed_dir / file_path.name
-            shutil.move(str(file_path), str(destination))
+            _move_file(file_path, destination)
             logger.debug(f"Moved {file_path.name} to processed")
         except Exception as e:
             logger.error(f"Failed to move file to processed: {e}")
@@ -309,7 +550,7 @@ class FileProcessor:
         """
         try:
             destination = self.errors_dir / file_path.name
-            shutil.move(str(file_path), str(destination))
+            _move_file(file_path, destination)
             logger.debug(f"Moved {file_path.name} to errors")
         except Exception as e:
             logger.error(f"Failed to move file to errors: {e}")
@@ -0,0 +1,69 @@
+"""JSON helpers using orjson when installed, falling back to the standard library."""
+
+import json
+import re
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # optional speedup, see the "fast" extra
+    orjson = None
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can catch this one
+JSONDecodeError = json.JSONDecodeError
+
+# Optional ```/```json fence around the body, as LLMs often wrap JSON replies in markdown
+_FENCE_RE = re.compile(r'^\s*(?:```(?:json)?\s*)?(.*?)\s*(?:```)?\s*$', re.DOTALL)
+
+
+def strip_code_fence(text: str) -> str:
+    """
+    Remove surrounding whitespace and a markdown code fence from an LLM reply.
+
+    Args:
+        text: Raw response text
+
+    Returns:
+        The text between the fences, or the stripped text if there are none
+    """
+    match = _FENCE_RE.match(text)
+    return match.group(1) if match else text.strip()
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    Parse a JSON document.
+
+    Args:
+        data: JSON text as str or UTF-8 bytes
+
+    Returns:
+        Parsed Python object
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any, pretty: bool = False) -> bytes:
+    """
+    Serialize an object to UTF-8 encoded JSON.
+
+    Output is compact unless pretty is set, in which case it is indented by
+    two spaces. Non-ASCII characters are written as-is rather than escaped.
+
+    Args:
+        obj: Object to serialize
+        pretty: Indent the output for human readers
+
+    Returns:
+        JSON document as UTF-8 bytes
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
@@ -1,30 +1,52 @@
 """LLM client for interacting with llama-server."""
 
 import base64
-import json
 import logging
-import mimetypes
 import requests
 from pathlib import Path
+from requests.adapters import HTTPAdapter
 from typing import Optional, Dict, Any
+from . import json_utils
 
 logger = logging.getLogger(__name__)
 
+# MIME types for the image formats sent to the vision model
+_EXT_MIME = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif',
+    '.bmp': 'image/bmp',
+    '.tif': 'image/tiff',
+    '.tiff': 'image/tiff',
+    '.pdf': 'application/pdf',
+}
+
 
 class LLMClient:
     """Client for interacting with llama-server API."""
     
-    def __init__(self, endpoint: str, timeout: int = 120):
+    def __init__(self, endpoint: str, timeout: int = 120, pool_size: int = 4):
         """
         Initialize LLM client.
         
         Args:
             endpoint: API endpoint URL
             timeout: Request timeout in seconds
+            pool_size: Maximum number of connections kept open to the server
         """
         self.endpoint = endpoint
         self.timeout = timeout
         self.chat_url = f"{endpoint}/v1/chat/completions"
+        
+        # Reuse connections to the server across requests (HTTP keep-alive).
+        # With pool_block, requests beyond pool_size wait for a kept-alive
+        # connection instead of opening a throwaway one per request.
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
     
     def generate_text(
         self, 
@@ -52,14 +74,17 @@ class LLMClient:
                 # For vision models, include the image as base64 data URL
                 # Read and encode the image
                 image_file = Path(image_path)
-                mime_type, _ = mimetypes.guess_type(str(image_file))
-                if not mime_type:
-                    mime_type = "image/jpeg"  # Default fallback
+                mime_type = _EXT_MIME.get(image_file.suffix.lower(), "image/jpeg")
                 
-                with open(image_file, "rb") as f:
-                    image_data = base64.b64encode(f.read()).decode("utf-8")
-                
-                data_url = f"data:{mime_type};base64,{image_data}"
+                # Read into memory rather than through a mapping: the file sits
+                # in a folder other processes write to, and a mapped file that
+                # is truncated while being read kills the process with SIGBUS.
+                # base64 output is pure ASCII.
+                image_data = image_file.read_bytes()
+                if not image_data:
+                    logger.error(f"Image file is empty: {image_file.name}")
+                    return None
+                data_url = f"data:{mime_type};base64," + base64.b64encode(image_data).decode("ascii")
                 
                 messages.append({
                     "role": "user",
@@ -89,14 +114,14 @@ class LLMClient:
             }
             
             logger.debug(f"Sending request to {self.chat_url}")
-            response = requests.post(
+            response = self._session.post(
                 self.chat_url,
                 json=payload,
                 timeout=self.timeout
             )
             response.raise_for_status()
             
-            result = response.json()
+            result = json_utils.loads(response.content)
             content = result['choices'][0]['message']['content']
             
             logger.debug(f"Received response: {len(content)} characters")
@@ -105,7 +130,7 @@ class LLMClient:
         except requests.exceptions.RequestException as e:
             logger.error(f"LLM request failed: {e}")
             return None
-        except (KeyError, IndexError) as e:
+        except (KeyError, IndexError, ValueError) as e:
             logger.error(f"Failed to parse LLM response: {e}")
             return None
     
@@ -129,19 +154,11 @@ class LLMClient:
             
             # Try to extract JSON from the response
             # Sometimes the model includes markdown code blocks
-            response = response.strip()
-            if response.startswith("```json"):
-                response = response[7:]
-            if response.startswith("```"):
-                response = response[3:]
-            if response.endswith("```"):
-                response = response[:-3]
-            
-            response = response.strip()
+            response = json_utils.strip_code_fence(response)
             
             try:
-                return json.loads(response)
-            except json.JSONDecodeError:
+                return json_utils.loads(response)
+            except json_utils.JSONDecodeError:
                 logger.error(f"Failed to parse JSON from LLM response: {response[:200]}")
                 return None
                 
@@ -0,0 +1,43 @@
+"""Logging configuration for Directory OCR."""
+
+import sys
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+
+def setup_logging(level: str = "INFO") -> None:
+    """
+    Configure logging for the application.
+    
+    Records are queued by the logging call and written to the console by a
+    background listener thread, so slow terminals or pipes never block
+    processing. Calling this again only updates the level, so handlers are
+    never attached twice.
+    
+    Args:
+        level: Logging level (DEBUG, INFO, WARNING, ERROR)
+    """
+    root_logger = logging.getLogger()
+    root_logger.setLevel(getattr(logging, level.upper()))
+    if root_logger.handlers:
+        return
+    
+    # Create formatter
+    formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    
+    # Console handler
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(formatter)
+    
+    # Console output is written from a listener thread fed by a queue
+    log_queue: queue.Queue = queue.Queue(-1)
+    listener = QueueListener(log_queue, console_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    
+    root_logger.addHandler(QueueHandler(log_queue))
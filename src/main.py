@@ -1,49 +1,145 @@
 """Main entry point for Directory OCR application."""
 
 import sys
-import time
+import signal
+import argparse
 import logging
+import threading
 from pathlib import Path
+from watchfiles import watch
 from .config import Config
 from .file_processor import FileProcessor
+from .logging_setup import setup_logging
+from .watcher import DirectoryWatcher, FileWatcher
 
+logger = logging.getLogger(__name__)
 
-def setup_logging(level: str = "INFO") -> None:
+
+def describe_config(config: Config) -> None:
     """
-    Configure logging for the application.
+    Log the effective configuration.
     
     Args:
-        level: Logging level (DEBUG, INFO, WARNING, ERROR)
+        config: Configuration object
     """
-    # Create formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    paths = config.paths
+    logger.info(f"Incoming folder: {paths['incoming']}")
+    logger.info(f"Extracted folder: {paths['extracted']}")
+    logger.info(f"Matches folder: {paths['matches']}")
+    logger.info(f"Processed folder: {paths['processed']}")
+    logger.info(f"Errors folder: {paths['errors']}")
+    logger.info(f"Match file: {config.match_file_path}")
+    logger.info(f"Sleep time: {config.sleep_time}s")
+    logger.info(f"Vision endpoint: {config.llm.get('vision_endpoint')}")
+    logger.info(f"Text endpoint: {config.llm.get('text_endpoint')}")
+
+
+def run_poll(config: Config) -> None:
+    """
+    Run the two-step pipeline until interrupted (blocking).
+    
+    Step 1 runs at start-up and whenever files are added to the incoming
+    folder, followed by step 2 if it processed any files. Both steps also run
+    every sleep_time seconds to pick up files that were still being written
+    and other changes, such as an updated match file; they return quickly
+    when nothing changed.
+    
+    Args:
+        config: Configuration object
+    """
+    processor = FileProcessor(config)
+    logger.info("File processor initialized")
+    logger.info("Starting processing loop...")
+    logger.info("Press Ctrl+C to stop (twice to abort the current step)")
+    
+    stop_event = threading.Event()
+    # Steps never run concurrently, so step 2 never reads a text file step 1 is still writing
+    pipeline_lock = threading.Lock()
+    
+    def run_steps() -> None:
+        with pipeline_lock:
+            # Step 1: Process files in incoming folder
+            processed_count = processor.process_step1()
+            
+            # Step 2: Match files in extracted folder (only if step 1 processed files)
+            if processed_count > 0:
+                processor.process_step2()
+    
+    def run_periodic() -> None:
+        while not stop_event.wait(config.sleep_time):
+            try:
+                with pipeline_lock:
+                    processor.process_step1()
+                    processor.process_step2()
+            except Exception as e:
+                logger.error(f"Periodic run failed: {e}", exc_info=True)
+    
+    def request_stop(signum, frame) -> None:
+        stop_event.set()
+        # A second Ctrl+C interrupts whatever is running (e.g. a stuck LLM request)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+    
+    # Ctrl+C lets the current step finish, then stops the watch loop
+    signal.signal(signal.SIGINT, request_stop)
+    periodic = threading.Thread(target=run_periodic, name="periodic", daemon=True)
+    periodic.start()
     
-    # Console handler
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(formatter)
+    # Files already waiting in incoming never produce a change event
+    run_steps()
+    for _ in watch(
+        processor.incoming_dir,
+        watch_filter=FileWatcher(processor, config).accepts,
+        stop_event=stop_event,
+        step=50,
+        recursive=False
+    ):
+        run_steps()
     
-    # Configure root logger
-    root_logger = logging.getLogger()
-    root_logger.setLevel(getattr(logging, level.upper()))
-    root_logger.addHandler(console_handler)
+    logger.info("Shutting down...")
+    # Let a periodic run that is in progress finish moving and writing files
+    stop_event.set()
+    periodic.join()
+    processor.close()
+
+
+def run_watch(config: Config) -> None:
+    """
+    Extract text from files as they arrive in the incoming folder (blocking).
+    
+    Args:
+        config: Configuration object
+    """
+    watcher = DirectoryWatcher(config)
+    logger.info("Directory watcher initialized")
+    logger.info("Press Ctrl+C to stop")
+    
+    # Files already waiting in incoming are queued by the watcher's first rescan
+    watcher.run()
 
 
 def main() -> None:
     """Main entry point."""
+    parser = argparse.ArgumentParser(
+        prog="directory-ocr",
+        description="Automated file processing pipeline with OCR and LLM-based text extraction"
+    )
+    parser.add_argument(
+        "mode",
+        nargs="?",
+        choices=("poll", "watch"),
+        default="poll",
+        help="poll: run step 1 and step 2 in a loop (default); "
+             "watch: extract text from files as they arrive"
+    )
+    parser.add_argument("--debug", action="store_true", help="Enable debug logging")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("Directory OCR - Automated File Processing Pipeline")
     print("=" * 60)
     
     # Setup logging
-    log_level = "INFO"
-    if len(sys.argv) > 1 and sys.argv[1] == "--debug":
-        log_level = "DEBUG"
-    
-    setup_logging(log_level)
-    logger = logging.getLogger(__name__)
+    setup_logging("DEBUG" if args.debug else "INFO")
     
     try:
         # Load configuration
@@ -56,38 +152,12 @@ def main() -> None:
         logger.info("Configuration loaded successfully")
         
         # Display configuration
-        logger.info(f"Incoming folder: {config.get_folder_path('incoming')}")
-        logger.info(f"Extracted folder: {config.get_folder_path('extracted')}")
-        logger.info(f"Matches folder: {config.get_folder_path('matches')}")
-        logger.info(f"Processed folder: {config.get_folder_path('processed')}")
-        logger.info(f"Errors folder: {config.get_folder_path('errors')}")
-        logger.info(f"Match file: {config.match_file_path}")
-        logger.info(f"Sleep time: {config.sleep_time}s")
-        logger.info(f"Vision endpoint: {config.llm.get('vision_endpoint')}")
-        logger.info(f"Text endpoint: {config.llm.get('text_endpoint')}")
-        
-        # Initialize processor
-        processor = FileProcessor(config)
-        logger.info("File processor initialized")
-        logger.info("Starting processing loop...")
-        logger.info("Press Ctrl+C to stop")
-        print("-" * 60)
+        describe_config(config)
         
-        # Main processing loop
-        iteration = 0
-        while True:
-            iteration += 1
-            logger.debug(f"--- Loop iteration {iteration} ---")
-            
-            # Step 1: Process files in incoming folder
-            processed_count = processor.process_step1()
-            
-            # Step 2: Match files in extracted folder (only if step 1 processed files)
-            if processed_count > 0:
-                processor.process_step2()
-            
-            # Sleep before next iteration
-            time.sleep(config.sleep_time)
+        if args.mode == "watch":
+            run_watch(config)
+        else:
+            run_poll(config)
         
     except KeyboardInterrupt:
         logger.info("Shutting down...")
@@ -1,27 +1,161 @@
 """Text extraction from PDF and images."""
 
+import hashlib
+import io
 import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional
-from PyPDF2 import PdfReader
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import pypdfium2 as pdfium
 from .llm_client import LLMClient
 
 logger = logging.getLogger(__name__)
 
+# PDFs with fewer pages are extracted in-process. PDFium takes roughly 0.2-2 ms
+# per page, while starting the worker processes costs ~300 ms once and handing
+# a block of pages to a warm worker ~4 ms (it re-reads and parses the PDF), so
+# only documents with hundreds of pages gain from being split
+_PARALLEL_MIN_PAGES = 200
+
+# Maximum number of OCR results kept in the cache; least recently used are dropped first
+_OCR_CACHE_MAX_ENTRIES = 10000
+
+# PDFium must not be called from several threads at once, even for different documents
+_PDFIUM_LOCK = threading.Lock()
+
+# Per-page extraction result: (1-based page number, text, error message)
+PageResult = Tuple[int, Optional[str], Optional[str]]
+
+
+def _extract_pages(pdf: pdfium.PdfDocument, start: int, stop: int) -> List[PageResult]:
+    """
+    Extract text from a range of pages.
+    
+    Args:
+        pdf: Open PDF document
+        start: Index of the first page (0-based)
+        stop: Index after the last page
+        
+    Returns:
+        One result per page, in page order
+    """
+    results = []
+    for index in range(start, stop):
+        try:
+            page = pdf[index]
+            try:
+                textpage = page.get_textpage()
+                try:
+                    # PDFium separates lines with CRLF
+                    text = textpage.get_text_range().replace("\r\n", "\n")
+                finally:
+                    textpage.close()
+            finally:
+                page.close()
+            results.append((index + 1, text, None))
+        except Exception as e:
+            results.append((index + 1, None, str(e)))
+    return results
+
+
+def _looks_scanned(pdf: pdfium.PdfDocument, page_count: int) -> bool:
+    """
+    Check whether a PDF is likely image-only by sampling its first and middle pages.
+    
+    Args:
+        pdf: Open PDF document
+        page_count: Number of pages in the document
+        
+    Returns:
+        True if every sampled page was read without error and has no text
+    """
+    for index in sorted({0, page_count // 2}):
+        _, text, error = _extract_pages(pdf, index, index + 1)[0]
+        if error is not None or (text and not text.isspace()):
+            return False
+    return True
+
+
+def _extract_pages_from_file(pdf_path: str, start: int, stop: int) -> List[PageResult]:
+    """Extract text from a range of pages of a PDF file (runs in a worker process)."""
+    pdf = pdfium.PdfDocument(Path(pdf_path).read_bytes())
+    try:
+        return _extract_pages(pdf, start, stop)
+    finally:
+        pdf.close()
+
 
 class TextExtractor:
     """Extract text from PDF files and images."""
     
-    def __init__(self, vision_client: Optional[LLMClient] = None, ocr_prompt: str = ""):
+    def __init__(
+        self,
+        vision_client: Optional[LLMClient] = None,
+        ocr_prompt: str = "",
+        cache_dir: Optional[Path] = None,
+        image_extensions: Iterable[str] = ('.jpg', '.jpeg', '.png'),
+        pdf_extensions: Iterable[str] = ('.pdf',)
+    ):
         """
         Initialize text extractor.
         
         Args:
             vision_client: LLM client for OCR on images
             ocr_prompt: Prompt to use for OCR
+            cache_dir: Folder for the OCR result cache (no caching if None)
+            image_extensions: Lowercased file extensions handled by OCR
+            pdf_extensions: Lowercased file extensions handled as PDFs
         """
         self.vision_client = vision_client
         self.ocr_prompt = ocr_prompt or "Please transcribe all visible text in this image."
+        
+        # Extractor per lowercased file extension
+        self._handlers: Dict[str, Callable[[Path], Optional[str]]] = {
+            **{ext: self.extract_from_image for ext in image_extensions},
+            **{ext: self.extract_from_pdf for ext in pdf_extensions},
+        }
+        
+        # OCR results keyed by a hash of prompt and image content, so retried or
+        # duplicate images skip the vision LLM
+        self._ocr_cache: Optional[sqlite3.Connection] = None
+        self._ocr_cache_lock = threading.Lock()
+        if cache_dir is not None:
+            try:
+                cache_dir.mkdir(parents=True, exist_ok=True)
+                self._ocr_cache = sqlite3.connect(
+                    str(cache_dir / "ocr.sqlite"),
+                    isolation_level=None,
+                    check_same_thread=False
+                )
+                self._ocr_cache.execute(
+                    "CREATE TABLE IF NOT EXISTS ocr "
+                    "(hash BLOB PRIMARY KEY, text TEXT NOT NULL, accessed REAL NOT NULL)"
+                )
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("OCR cache disabled, could not open it in %s: %s", cache_dir, e)
+                self._ocr_cache = None
+        
+        # Page text extraction is CPU bound and PDFium is single threaded, so
+        # large PDFs are split across processes. Workers are spawned on first
+        # use; "spawn" avoids forking a process that has OCR threads running.
+        self._pdf_workers = os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(
+            max_workers=self._pdf_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    
+    def close(self) -> None:
+        """Shut down the PDF worker processes and close the OCR cache."""
+        self._pool.shutdown(wait=True)
+        with self._ocr_cache_lock:
+            if self._ocr_cache is not None:
+                self._ocr_cache.close()
+                self._ocr_cache = None
     
     def extract_from_pdf(self, pdf_path: Path) -> Optional[str]:
         """
@@ -34,30 +168,64 @@ class TextExtractor:
             Extracted text or None if extraction failed
         """
         try:
-            logger.info(f"Extracting text from PDF: {pdf_path.name}")
-            
-            reader = PdfReader(str(pdf_path))
-            text_parts = []
+            logger.info("Extracting text from PDF: %s", pdf_path.name)
             
-            for page_num, page in enumerate(reader.pages, 1):
+            # PDFium parses a private in-memory copy. Reading from the file (or a
+            # mapping of it) while another process truncates it crashes PDFium
+            # and the whole process with it; a copy can at worst be incomplete.
+            pdf_data = pdf_path.read_bytes()
+            with _PDFIUM_LOCK:
+                pdf = pdfium.PdfDocument(pdf_data)
                 try:
-                    text = page.extract_text()
-                    if text:
-                        text_parts.append(text)
-                        logger.debug(f"Extracted {len(text)} characters from page {page_num}")
-                except Exception as e:
-                    logger.warning(f"Failed to extract text from page {page_num}: {e}")
-            
-            if not text_parts:
-                logger.warning(f"No text extracted from PDF: {pdf_path.name}")
+                    page_count = len(pdf)
+                    # Pages without a text layer are cheap to walk, so a PDF
+                    # whose sampled pages have no text (likely scanned) is
+                    # extracted in-process instead of being sent to the workers
+                    parallel = (
+                        page_count >= _PARALLEL_MIN_PAGES
+                        and self._pdf_workers > 1
+                        and not _looks_scanned(pdf, page_count)
+                    )
+                    if not parallel:
+                        results = _extract_pages(pdf, 0, page_count)
+                finally:
+                    pdf.close()
+            
+            if parallel:
+                # One contiguous block of pages per worker; each worker reads the
+                # file itself (from the page cache) instead of the parent
+                # pickling the whole PDF to every worker
+                chunks = min(self._pdf_workers, page_count)
+                bounds = [page_count * i // chunks for i in range(chunks + 1)]
+                futures = [
+                    self._pool.submit(_extract_pages_from_file, str(pdf_path), start, stop)
+                    for start, stop in zip(bounds, bounds[1:])
+                ]
+                results = [result for future in futures for result in future.result()]
+            
+            # Pages are appended to one buffer, separated by blank lines; the
+            # per-page strings are released before the final copy is made
+            buf = io.StringIO()
+            for page_num, text, error in results:
+                if error is not None:
+                    logger.warning("Failed to extract text from page %d: %s", page_num, error)
+                elif text:
+                    if buf.tell():
+                        buf.write("\n\n")
+                    buf.write(text)
+                    logger.debug("Extracted %d characters from page %d", len(text), page_num)
+            del results
+            
+            full_text = buf.getvalue()
+            if not full_text:
+                logger.warning("No text extracted from PDF: %s", pdf_path.name)
                 return None
             
-            full_text = "\n\n".join(text_parts)
-            logger.info(f"Successfully extracted {len(full_text)} characters from PDF")
+            logger.info("Successfully extracted %d characters from PDF", len(full_text))
             return full_text
             
         except Exception as e:
-            logger.error(f"PDF extraction failed for {pdf_path.name}: {e}")
+            logger.error("PDF extraction failed for %s: %s", pdf_path.name, e)
             return None
     
     def extract_from_image(self, image_path: Path) -> Optional[str]:
@@ -75,10 +243,19 @@ class TextExtractor:
             return None
         
         try:
-            logger.info(f"Performing OCR on image: {image_path.name}")
+            logger.info("Performing OCR on image: %s", image_path.name)
             
-            # Use absolute path for the image
-            abs_path = str(image_path.resolve())
+            cache_key = None
+            if self._ocr_cache is not None:
+                cache_key = self._ocr_cache_key(image_path)
+                cached = self._ocr_cache_get(cache_key)
+                if cached is not None:
+                    logger.info("Using cached OCR result for %s", image_path.name)
+                    return cached
+            
+            # Use absolute path for the image; callers already pass absolute
+            # paths, so this normally costs no file system calls
+            abs_path = str(image_path) if image_path.is_absolute() else os.path.abspath(image_path)
             
             # Call LLM with vision capabilities
             text = self.vision_client.generate_text(
@@ -87,16 +264,77 @@ class TextExtractor:
             )
             
             if text:
-                logger.info(f"Successfully extracted {len(text)} characters from image")
+                logger.info("Successfully extracted %d characters from image", len(text))
+                if cache_key is not None:
+                    self._ocr_cache_put(cache_key, text)
             else:
-                logger.warning(f"No text extracted from image: {image_path.name}")
+                logger.warning("No text extracted from image: %s", image_path.name)
             
             return text
             
         except Exception as e:
-            logger.error(f"Image OCR failed for {image_path.name}: {e}")
+            logger.error("Image OCR failed for %s: %s", image_path.name, e)
             return None
     
+    def _ocr_cache_key(self, image_path: Path) -> bytes:
+        """
+        Compute the OCR cache key for an image.
+        
+        Args:
+            image_path: Path to image file
+            
+        Returns:
+            BLAKE2b digest of the OCR prompt and the image content
+        """
+        digest = hashlib.blake2b(self.ocr_prompt.encode('utf-8'), digest_size=16)
+        digest.update(b'\0')
+        digest.update(image_path.read_bytes())
+        return digest.digest()
+    
+    def _ocr_cache_get(self, key: bytes) -> Optional[str]:
+        """
+        Look up a cached OCR result and mark it as recently used.
+        
+        Args:
+            key: Cache key from _ocr_cache_key
+            
+        Returns:
+            Cached text or None if not cached
+        """
+        try:
+            with self._ocr_cache_lock:
+                row = self._ocr_cache.execute("SELECT text FROM ocr WHERE hash = ?", (key,)).fetchone()
+                if row is not None:
+                    self._ocr_cache.execute(
+                        "UPDATE ocr SET accessed = ? WHERE hash = ?", (time.time(), key)
+                    )
+        except sqlite3.Error as e:
+            logger.warning("OCR cache lookup failed: %s", e)
+            return None
+        return row[0] if row is not None else None
+    
+    def _ocr_cache_put(self, key: bytes, text: str) -> None:
+        """
+        Store an OCR result, dropping the least recently used entries over the limit.
+        
+        Args:
+            key: Cache key from _ocr_cache_key
+            text: Extracted text
+        """
+        try:
+            with self._ocr_cache_lock:
+                self._ocr_cache.execute(
+                    "INSERT OR REPLACE INTO ocr (hash, text, accessed) VALUES (?, ?, ?)",
+                    (key, text, time.time())
+                )
+                self._ocr_cache.execute(
+                    "DELETE FROM ocr WHERE hash IN "
+                    "(SELECT hash FROM ocr ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (_OCR_CACHE_MAX_ENTRIES,)
+                )
+        except sqlite3.Error as e:
+            logger.warning("OCR cache update failed: %s", e)
+    
     def extract_text(self, file_path: Path) -> Optional[str]:
         """
         Extract text from file (auto-detect type).
@@ -107,12 +345,8 @@ class TextExtractor:
         Returns:
             Extracted text or None if extraction failed
         """
-        suffix = file_path.suffix.lower()
-        
-        if suffix == '.pdf':
-            return self.extract_from_pdf(file_path)
-        elif suffix in ['.jpg', '.jpeg', '.png']:
-            return self.extract_from_image(file_path)
-        else:
-            logger.error(f"Unsupported file type: {suffix}")
+        handler = self._handlers.get(file_path.suffix.lower())
+        if handler is None:
+            logger.error("Unsupported file type: %s", file_path.suffix)
             return None
+        return handler(file_path)
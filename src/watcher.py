@@ -1,18 +1,22 @@
 """File system watcher for monitoring incoming folder."""
 
+import asyncio
 import logging
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler, FileCreatedEvent
+from typing import Optional, Set
+from watchfiles import Change, awatch
 from .file_processor import FileProcessor
 from .config import Config
 
 logger = logging.getLogger(__name__)
 
 
-class FileWatcher(FileSystemEventHandler):
-    """Watch for new files in the incoming folder."""
+class FileWatcher:
+    """Handle new files in the incoming folder."""
     
     def __init__(self, processor: FileProcessor, config: Config):
         """
@@ -22,47 +26,46 @@ class FileWatcher(FileSystemEventHandler):
             processor: File processor instance
             config: Configuration object
         """
-        super().__init__()
         self.processor = processor
         self.config = config
         
         # Get supported extensions
-        processing = config.processing
-        self.supported_extensions = set(
-            processing.get('image_extensions', []) + 
-            processing.get('pdf_extensions', [])
-        )
+        self.supported_extensions = config.supported_extensions
         
-        logger.info(f"Watching for files with extensions: {self.supported_extensions}")
+        logger.info("Watching for files with extensions: %s", sorted(self.supported_extensions))
     
-    def on_created(self, event: FileCreatedEvent) -> None:
+    def accepts(self, change: Change, path: str) -> bool:
         """
-        Handle file creation event.
+        Filter file system changes (used as the watchfiles watch_filter).
         
         Args:
-            event: File system event
-        """
-        # Ignore directories
-        if event.is_directory:
-            return
+            change: Type of change
+            path: Path of the changed file
         
-        file_path = Path(event.src_path)
-        
-        # Check if file extension is supported
-        if file_path.suffix.lower() not in self.supported_extensions:
-            logger.debug(f"Ignoring unsupported file: {file_path.name}")
-            return
-        
-        logger.info(f"New file detected: {file_path.name}")
+        Returns:
+            True for newly added files with a supported extension
+        """
+        return (
+            change == Change.added
+            and os.path.splitext(path)[1].lower() in self.supported_extensions
+        )
+    
+    def on_created(self, file_path: Path) -> None:
+        """
+        Handle a file in the incoming folder.
         
-        # Small delay to ensure file is fully written
-        time.sleep(0.5)
+        Waits until the file has been fully written, then processes it. A file
+        still being written is left in incoming for the next rescan. Errors are
+        logged rather than raised, as this runs on a worker thread.
         
-        # Process the file
+        Args:
+            file_path: Path to the new file
+        """
         try:
-            self.processor.process_file(file_path)
+            if self.processor.wait_until_written(file_path):
+                self.processor.process_file(file_path)
         except Exception as e:
-            logger.error(f"Unexpected error processing {file_path.name}: {e}", exc_info=True)
+            logger.error("Unexpected error processing %s: %s", file_path.name, e, exc_info=True)
 
 
 class DirectoryWatcher:
@@ -78,38 +81,116 @@ class DirectoryWatcher:
         self.config = config
         self.processor = FileProcessor(config)
         self.handler = FileWatcher(self.processor, config)
-        self.observer = Observer()
         
-        self.watch_dir = config.get_folder_path('incoming')
-        self.watch_dir.mkdir(parents=True, exist_ok=True)
-    
-    def start(self) -> None:
-        """Start watching the incoming directory."""
-        logger.info(f"Starting directory watch on: {self.watch_dir}")
+        # FileProcessor has already created the folder
+        self.watch_dir = self.processor.incoming_dir
         
-        self.observer.schedule(
-            self.handler,
-            str(self.watch_dir),
-            recursive=False
+        # New files are handed to a bounded pool, so the watch loop keeps
+        # draining events while OCR requests are in flight
+        self._pool = ThreadPoolExecutor(
+            max_workers=config.workers,
+            thread_name_prefix="ocr"
         )
         
-        self.observer.start()
+        # Files submitted to the pool and not finished yet, so a rescan never
+        # hands the same file to two workers
+        self._pending: Set[Path] = set()
+        self._pending_lock = threading.Lock()
+        
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def _submit(self, file_path: Path) -> None:
+        """
+        Queue a file for processing unless it is already queued.
+        
+        Args:
+            file_path: Path to the file in incoming
+        """
+        with self._pending_lock:
+            if file_path in self._pending:
+                return
+            self._pending.add(file_path)
+        self._pool.submit(self._handle, file_path)
+    
+    def _handle(self, file_path: Path) -> None:
+        """Process a queued file (runs on a pool thread)."""
+        try:
+            self.handler.on_created(file_path)
+        finally:
+            with self._pending_lock:
+                self._pending.discard(file_path)
+    
+    def _rescan(self) -> None:
+        """Queue every file waiting in incoming, e.g. ones still being written earlier."""
+        try:
+            files = self.processor.list_incoming()
+        except OSError as e:
+            logger.error("Could not list %s: %s", self.watch_dir, e)
+            return
+        for file_path in files:
+            self._submit(file_path)
+    
+    async def _arun(self) -> None:
+        """Watch the incoming directory until stopped."""
+        logger.info("Starting directory watch on: %s", self.watch_dir)
         logger.info("Directory watcher started successfully")
+        
+        # Create the extractor before fanning out so workers share one instance
+        self.processor.text_extractor
+        
+        # Files left in incoming (already there at start-up, or still being
+        # written when their event came) are picked up by a rescan every
+        # sleep_time seconds; idle timeouts wake the loop so rescans also happen
+        # when no events arrive. The first rescan runs on the first wake-up,
+        # once the watch is in place, so no file can slip in between the two.
+        interval = self.config.sleep_time
+        next_rescan = time.monotonic()
+        async for changes in awatch(
+            self.watch_dir,
+            watch_filter=self.handler.accepts,
+            stop_event=self._stop_event,
+            rust_timeout=int(interval * 1000),
+            yield_on_timeout=True,
+            recursive=False
+        ):
+            for _, path in changes:
+                logger.info("New file detected: %s", os.path.basename(path))
+                self._submit(Path(path))
+            if time.monotonic() >= next_rescan:
+                self._rescan()
+                next_rescan = time.monotonic() + interval
+    
+    def start(self) -> None:
+        """Start watching the incoming directory in a background thread."""
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=asyncio.run,
+            args=(self._arun(),),
+            name="directory-watcher",
+            daemon=True
+        )
+        self._thread.start()
     
     def stop(self) -> None:
         """Stop watching the directory."""
         logger.info("Stopping directory watcher")
-        self.observer.stop()
-        self.observer.join()
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._pool.shutdown(wait=True)
+        self.processor.close()
         logger.info("Directory watcher stopped")
     
     def run(self) -> None:
         """Run the watcher (blocking)."""
-        self.start()
-        
+        self._stop_event.clear()
         try:
-            while True:
-                time.sleep(1)
+            asyncio.run(self._arun())
         except KeyboardInterrupt:
             logger.info("Received shutdown signal")
-            self.stop()
+        # Let files already being processed finish
+        self._pool.shutdown(wait=True)
+        self.processor.close()
+        logger.info("Directory watcher stopped")